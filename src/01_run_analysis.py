@@ -8,6 +8,7 @@ import sys
 import os
 import pandas as pd
 from pathlib import Path
+from typing import Optional
 
 # Add src directory to path
 sys.path.append(str(Path(__file__).parent))
@@ -17,16 +18,24 @@ from utils import (
     get_database_connection, 
     get_sqlalchemy_engine
 )
+from extract_store import (
+    new_snapshot_id,
+    load_manifest,
+    write_partitioned_extract,
+    publish_manifest,
+    vacuum_store,
+    store_lock
+)
 
-def run_analysis_query(conn, query_name: str, query: str) -> pd.DataFrame:
-    """Run an analysis query and return results as DataFrame."""
+def run_analysis_query(conn, query_name: str, query: str) -> Optional[pd.DataFrame]:
+    """Run an analysis query and return results as DataFrame, or None if it fails."""
     try:
         df = pd.read_sql(query, conn)
         print(f"✓ {query_name}: {len(df)} rows returned")
         return df
     except Exception as e:
         print(f"✗ {query_name}: Failed - {e}")
-        return pd.DataFrame()
+        return None
 
 def main():
     """Main function to run Netflix content analysis."""
@@ -105,11 +114,11 @@ def main():
             
             "Top Actors": """
                 SELECT 
-                    TRIM(unnest(string_to_array(cast, ','))) as actor_name,
+                    TRIM(unnest(string_to_array("cast", ','))) as actor_name,
                     COUNT(*) as title_count
                 FROM netflix_titles 
-                WHERE cast IS NOT NULL AND cast != ''
-                GROUP BY TRIM(unnest(string_to_array(cast, ',')))
+                WHERE "cast" IS NOT NULL AND "cast" != ''
+                GROUP BY TRIM(unnest(string_to_array("cast", ',')))
                 ORDER BY title_count DESC
                 LIMIT 15;
             """,
@@ -128,9 +137,14 @@ def main():
         # Run all analysis queries
         print("\nRunning analysis queries...")
         results = {}
+        failed_queries = []
         
         for query_name, query in analysis_queries.items():
-            results[query_name] = run_analysis_query(engine, query_name, query)
+            df = run_analysis_query(engine, query_name, query)
+            if df is None:
+                failed_queries.append(query_name)
+                df = pd.DataFrame()
+            results[query_name] = df
         
         # Generate summary insights
         print("\n" + "="*60)
@@ -173,18 +187,47 @@ def main():
         
         print("="*60)
         
-        # Save results to CSV for further analysis
-        output_dir = Path(config['data']['processed_dir'])
-        output_dir.mkdir(exist_ok=True)
+        conn.close()
         
-        for query_name, df in results.items():
-            if not df.empty:
-                filename = f"{query_name.lower().replace(' ', '_')}.csv"
-                output_path = output_dir / filename
-                df.to_csv(output_path, index=False)
-                print(f"Saved {query_name} results to: {output_path}")
+        if failed_queries:
+            print(f"\nWARNING: {len(failed_queries)} queries failed: {', '.join(failed_queries)}")
+            print("Snapshot was not published; the previous snapshot remains current.")
+            return False
         
-        conn.close()
+        # Save results to the extract store for further analysis
+        output_dir = Path(config['data']['analysis_store_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        store_config = config.get('extract_store', {})
+        partition_columns = store_config.get('partition_columns', {})
+        
+        with store_lock(str(output_dir)):
+            previous_manifest = load_manifest(str(output_dir))
+            snapshot_id = new_snapshot_id()
+            manifest_views = {}
+            
+            for query_name, df in results.items():
+                view_name = query_name.lower().replace(' ', '_')
+                manifest_views[view_name] = write_partitioned_extract(
+                    df, str(output_dir), snapshot_id, view_name,
+                    partition_columns.get(view_name), previous_manifest
+                )
+                print(f"Saved {query_name} results as: {view_name}")
+            
+            try:
+                publish_manifest(str(output_dir), snapshot_id, manifest_views)
+            except Exception as e:
+                print(f"ERROR: Publishing snapshot {snapshot_id} failed: {e}")
+                print("The previous snapshot remains current.")
+                return False
+            
+            # The new snapshot is live from here on, so cleanup problems are not fatal
+            try:
+                vacuum_store(str(output_dir), store_config.get('retain_snapshots', 3))
+            except Exception as e:
+                print(f"WARNING: Removing old snapshots failed: {e}")
+        
+        print(f"Published snapshot {snapshot_id} in: {output_dir}")
         print("\nAnalysis completed successfully!")
         return True
         
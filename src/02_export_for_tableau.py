@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Netflix Content Analytics - Tableau Export Script
-Exports database views to CSV files optimized for Tableau Public dashboard creation.
+Exports database views to a partitioned, versioned CSV extract store for Tableau Public.
 """
 
 import sys
@@ -15,7 +15,15 @@ sys.path.append(str(Path(__file__).parent))
 from utils import (
     load_config, 
     get_sqlalchemy_engine,
-    export_view_to_csv
+    read_view
+)
+from extract_store import (
+    new_snapshot_id,
+    load_manifest,
+    write_partitioned_extract,
+    publish_manifest,
+    vacuum_store,
+    store_lock
 )
 
 def main():
@@ -47,43 +55,74 @@ def main():
         output_dir.mkdir(parents=True, exist_ok=True)
         print(f"Export directory: {output_dir}")
         
-        # Export each view
-        print("\nExporting views to CSV for Tableau...")
-        export_results = {}
-        
-        for view_name in views_to_export:
-            output_path = output_dir / f"{view_name}.csv"
-            success = export_view_to_csv(engine, view_name, str(output_path))
-            export_results[view_name] = success
-        
-        # Summary
-        print("\n" + "="*60)
-        print("TABLEAU EXPORT SUMMARY")
-        print("="*60)
-        
-        successful_exports = sum(export_results.values())
-        total_exports = len(export_results)
-        
-        print(f"Successfully exported: {successful_exports}/{total_exports} views")
-        
-        for view_name, success in export_results.items():
-            status = "✓" if success else "✗"
-            print(f"{status} {view_name}")
+        store_config = config.get('extract_store', {})
+        partition_columns = store_config.get('partition_columns', {})
         
-        print("="*60)
+        with store_lock(str(output_dir)):
+            previous_manifest = load_manifest(str(output_dir))
+            snapshot_id = new_snapshot_id()
+            
+            # Export each view into a new snapshot
+            print(f"\nExporting views to snapshot {snapshot_id} for Tableau...")
+            export_results = {}
+            manifest_views = {}
+            
+            for view_name in views_to_export:
+                try:
+                    df = read_view(engine, view_name)
+                    manifest_views[view_name] = write_partitioned_extract(
+                        df, str(output_dir), snapshot_id, view_name,
+                        partition_columns.get(view_name), previous_manifest
+                    )
+                    export_results[view_name] = True
+                except Exception as e:
+                    print(f"Failed to export {view_name}: {e}")
+                    export_results[view_name] = False
+            
+            # Summary
+            print("\n" + "="*60)
+            print("TABLEAU EXPORT SUMMARY")
+            print("="*60)
+            
+            successful_exports = sum(export_results.values())
+            total_exports = len(export_results)
+            
+            print(f"Successfully exported: {successful_exports}/{total_exports} views")
+            
+            for view_name, success in export_results.items():
+                status = "✓" if success else "✗"
+                print(f"{status} {view_name}")
+            
+            print("="*60)
+            
+            if successful_exports != total_exports:
+                print(f"\nWARNING: {total_exports - successful_exports} exports failed!")
+                print("Snapshot was not published; the previous snapshot remains current.")
+                return False
+            
+            # Only a complete snapshot is published; a failed run leaves the previous one live
+            try:
+                publish_manifest(str(output_dir), snapshot_id, manifest_views)
+            except Exception as e:
+                print(f"ERROR: Publishing snapshot {snapshot_id} failed: {e}")
+                print("The previous snapshot remains current.")
+                return False
+            
+            # The new snapshot is live from here on, so cleanup problems are not fatal
+            try:
+                vacuum_store(str(output_dir), store_config.get('retain_snapshots', 3))
+            except Exception as e:
+                print(f"WARNING: Removing old snapshots failed: {e}")
         
-        if successful_exports == total_exports:
-            print("\nAll views exported successfully for Tableau!")
-            print(f"CSV files are ready in: {output_dir}")
-            print("\nNext steps for Tableau Public:")
-            print("1. Download Tableau Public (free) from tableau.com")
-            print("2. Open Tableau Public")
-            print("3. Import the CSV files from the bi_exports directory")
-            print("4. Build your dashboard following the Tableau guide")
-            print("5. Publish to Tableau Public for portfolio sharing")
-        else:
-            print(f"\nWARNING: {total_exports - successful_exports} exports failed!")
-            return False
+        print("\nAll views exported successfully for Tableau!")
+        print(f"Published snapshot {snapshot_id} in: {output_dir}")
+        print(f"CSV files are ready in: {output_dir / 'current'}")
+        print("\nNext steps for Tableau Public:")
+        print("1. Download Tableau Public (free) from tableau.com")
+        print("2. Open Tableau Public")
+        print("3. Import the CSV files from the current/ folder of the exports directory")
+        print("4. Build your dashboard following the Tableau guide")
+        print("5. Publish to Tableau Public for portfolio sharing")
         
         return True
         
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import shutil
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import quote
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Layout of a store directory:
+#   current -> snapshots/<id>                   symlink, swapped to publish
+#   snapshots/<id>/manifest.json                row counts and checksums
+#   snapshots/<id>/<view>.csv                   full view in source row order
+#   snapshots/<id>/partitions/<view>/<col>=<key>/part.csv
+CURRENT_DIR = "current"
+SNAPSHOTS_DIR = "snapshots"
+PARTITIONS_DIR = "partitions"
+MANIFEST_FILE = "manifest.json"
+HISTORY_FILE = "_PUBLISHED"
+LOCK_FILE = "_LOCK"
+PARTITION_FILE = "part.csv"
+# quote() only emits uppercase %XX escapes, so "%null" can never be a real value's key
+NULL_PARTITION = "%null"
+ALL_PARTITION = "__all__"
+
+def new_snapshot_id() -> str:
+    """Generate a sortable snapshot identifier from the current UTC time."""
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+def partition_key(value: Any) -> str:
+    """Convert a partition column value to its directory-safe string key."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return NULL_PARTITION
+    # Year columns come back from EXTRACT() as floats (2019.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    # Percent-encoding is reversible, so distinct strings get distinct keys
+    return quote(str(value), safe=' ')
+
+def _sha256(path: Path) -> str:
+    """Compute the SHA-256 checksum of a file."""
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+@contextmanager
+def store_lock(store_dir: str) -> Iterator[None]:
+    """Hold an exclusive lock on a store while writing, publishing and vacuuming."""
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    lock_path = Path(store_dir) / LOCK_FILE
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise RuntimeError(f"Extract store is locked by another run; remove {lock_path} if that run crashed") from None
+    try:
+        os.write(fd, str(os.getpid()).encode('utf-8'))
+        os.close(fd)
+        yield
+    finally:
+        lock_path.unlink()
+
+def load_manifest(store_dir: str) -> Optional[Dict[str, Any]]:
+    """Load the currently published manifest, or None if nothing is published."""
+    manifest_path = Path(store_dir) / CURRENT_DIR / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+def write_partitioned_extract(df: pd.DataFrame, store_dir: str, snapshot_id: str,
+                              view_name: str, partition_column: Optional[str] = None,
+                              previous_manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write a view into a snapshot as a flat CSV plus CSV partitions and return its manifest entry.
+
+    Partitions whose checksum matches the previous manifest are not rewritten;
+    the new entry points at the existing file instead.
+    """
+    if partition_column is not None and partition_column not in df.columns:
+        raise ValueError(f"Partition column '{partition_column}' not found in {view_name}")
+
+    # The flat file keeps the view's ORDER BY and is what BI tools read through current/
+    snapshot_dir = Path(store_dir) / SNAPSHOTS_DIR / snapshot_id
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    flat_payload = df.to_csv(index=False).encode('utf-8')
+    with open(snapshot_dir / f"{view_name}.csv", 'wb') as file:
+        file.write(flat_payload)
+
+    previous_partitions = {}
+    if previous_manifest is not None:
+        previous_view = previous_manifest.get('views', {}).get(view_name, {})
+        if previous_view.get('partition_column') == partition_column:
+            previous_partitions = previous_view.get('partitions', {})
+
+    if partition_column is None:
+        groups = [(ALL_PARTITION, df)]
+    else:
+        keys = df[partition_column].map(partition_key)
+        # Partitions are listed in the order their keys first appear in the view
+        groups = [(key, group) for key, group in df.groupby(keys, sort=False)]
+
+    partitions = {}
+    rewritten = 0
+    for key, group in groups:
+        payload = group.to_csv(index=False).encode('utf-8')
+        checksum = hashlib.sha256(payload).hexdigest()
+
+        previous = previous_partitions.get(key)
+        if previous is not None and previous['sha256'] == checksum \
+                and (Path(store_dir) / previous['path']).exists():
+            partitions[key] = previous
+            continue
+
+        relative_path = Path(SNAPSHOTS_DIR) / snapshot_id / PARTITIONS_DIR / view_name \
+            / f"{partition_column or 'partition'}={key}" / PARTITION_FILE
+        output_path = Path(store_dir) / relative_path
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'wb') as file:
+            file.write(payload)
+
+        partitions[key] = {
+            'path': relative_path.as_posix(),
+            'row_count': len(group),
+            'sha256': checksum
+        }
+        rewritten += 1
+
+    logger.info(f"Wrote {view_name}: {rewritten}/{len(partitions)} partitions rewritten")
+    return {
+        'partition_column': partition_column,
+        'columns': list(df.columns),
+        'row_count': len(df),
+        'file': {
+            'path': (Path(SNAPSHOTS_DIR) / snapshot_id / f"{view_name}.csv").as_posix(),
+            'sha256': hashlib.sha256(flat_payload).hexdigest()
+        },
+        'partitions': partitions
+    }
+
+def publish_manifest(store_dir: str, snapshot_id: str, views: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Publish a snapshot by writing its manifest and atomically repointing current/ at it."""
+    for view_name, view in views.items():
+        paths = [view['file']['path']] + [entry['path'] for entry in view['partitions'].values()]
+        for path in paths:
+            if not (Path(store_dir) / path).exists():
+                raise FileNotFoundError(f"Cannot publish {snapshot_id}: {view_name} file {path} is missing")
+
+    manifest = {
+        'snapshot_id': snapshot_id,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'views': views
+    }
+    snapshot_dir = Path(store_dir) / SNAPSHOTS_DIR / snapshot_id
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_dir / MANIFEST_FILE, 'w') as file:
+        json.dump(manifest, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+
+    # Swapping the symlink is the only publish step, so readers of current/
+    # see either the whole old snapshot or the whole new one
+    tmp_link = Path(store_dir) / f".{CURRENT_DIR}.{snapshot_id}.tmp"
+    os.symlink(Path(SNAPSHOTS_DIR) / snapshot_id, tmp_link, target_is_directory=True)
+    os.replace(tmp_link, Path(store_dir) / CURRENT_DIR)
+
+    # The snapshot is live at this point; history only feeds vacuum retention
+    try:
+        with open(Path(store_dir) / HISTORY_FILE, 'a') as file:
+            file.write(f"{snapshot_id}\n")
+    except OSError as e:
+        logger.warning(f"Published {snapshot_id} but could not record it in {HISTORY_FILE}: {e}")
+
+    logger.info(f"Published snapshot {snapshot_id} with {len(views)} views to {store_dir}")
+    return manifest
+
+def read_extract(store_dir: str, view_name: str, partitions: Optional[Iterable[Any]] = None,
+                 verify: bool = False) -> pd.DataFrame:
+    """Read a view from the published snapshot, loading only the requested partitions.
+
+    Without a partition filter the flat file is read, so rows keep the view's
+    original order. With a filter, rows keep their order within each partition
+    and partitions follow the order in which they first appeared.
+    """
+    manifest = load_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No published manifest in {store_dir}")
+    if view_name not in manifest['views']:
+        raise KeyError(f"View '{view_name}' not in snapshot {manifest['snapshot_id']}")
+
+    view = manifest['views'][view_name]
+    if partitions is None:
+        selected = {ALL_PARTITION: view['file']}
+    else:
+        wanted = {partition_key(value) for value in partitions}
+        selected = {key: entry for key, entry in view['partitions'].items() if key in wanted}
+
+    frames = []
+    for key, entry in selected.items():
+        path = Path(store_dir) / entry['path']
+        if verify and _sha256(path) != entry['sha256']:
+            raise ValueError(f"Checksum mismatch for {view_name} partition {key}: {path}")
+        frames.append(pd.read_csv(path))
+
+    if not frames:
+        return pd.DataFrame(columns=view['columns'])
+    return pd.concat(frames, ignore_index=True)
+
+def _referenced_snapshots(manifest: Dict[str, Any]) -> Set[str]:
+    """Return the snapshot ids whose files a manifest depends on."""
+    referenced = {manifest['snapshot_id']}
+    for view in manifest['views'].values():
+        for entry in view['partitions'].values():
+            referenced.add(Path(entry['path']).parts[1])
+    return referenced
+
+def vacuum_store(store_dir: str, retain: int = 3) -> List[str]:
+    """Remove snapshot directories not needed by the most recently published manifests.
+
+    `retain` counts published snapshots including the current one. Call this
+    while holding store_lock so no run is still writing a snapshot.
+    """
+    manifest = load_manifest(store_dir)
+    snapshots_root = Path(store_dir) / SNAPSHOTS_DIR
+    if manifest is None or not snapshots_root.exists():
+        return []
+
+    history_path = Path(store_dir) / HISTORY_FILE
+    published_ids = []
+    if history_path.exists():
+        with open(history_path, 'r') as file:
+            published_ids = [line.strip() for line in file if line.strip()]
+
+    # Keep what recent published manifests reference so readers holding one can finish
+    referenced = _referenced_snapshots(manifest)
+    for snapshot_id in (published_ids[-retain:] if retain > 0 else []):
+        manifest_path = snapshots_root / snapshot_id / MANIFEST_FILE
+        if manifest_path.exists():
+            with open(manifest_path, 'r') as file:
+                referenced |= _referenced_snapshots(json.load(file))
+
+    removed = []
+    for snapshot_id in sorted(path.name for path in snapshots_root.iterdir() if path.is_dir()):
+        if snapshot_id in referenced:
+            continue
+        shutil.rmtree(snapshots_root / snapshot_id)
+        removed.append(snapshot_id)
+
+    if removed:
+        kept = [snapshot_id for snapshot_id in published_ids if snapshot_id not in removed]
+        with open(history_path, 'w') as file:
+            file.writelines(f"{snapshot_id}\n" for snapshot_id in kept)
+        logger.info(f"Removed {len(removed)} unreferenced snapshots from {store_dir}")
+    return removed
@@ -99,17 +99,16 @@ def clean_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     
     return df_clean
 
-def export_view_to_csv(engine: Any, view_name: str, output_path: str) -> bool:
-    """Export a database view to CSV file."""
+def read_view(engine: Any, view_name: str) -> pd.DataFrame:
+    """Read a database view into a DataFrame."""
     try:
         query = f"SELECT * FROM {view_name}"
         df = pd.read_sql(query, engine)
-        df.to_csv(output_path, index=False)
-        logger.info(f"Successfully exported {view_name} to {output_path}")
-        return True
+        logger.info(f"Successfully read {view_name} ({len(df)} rows)")
+        return df
     except Exception as e:
-        logger.error(f"Failed to export {view_name}: {e}")
-        return False
+        logger.error(f"Failed to read {view_name}: {e}")
+        raise
 
 def run_sql_script(conn: psycopg2.extensions.connection, script_path: str) -> bool:
     """Run a SQL script file."""
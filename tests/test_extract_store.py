@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Test suite for the partitioned extract store.
+Tests partitioned writes, manifest publication, pruning and incremental loads.
+"""
+
+import pytest
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+from extract_store import (
+    load_manifest,
+    write_partitioned_extract,
+    publish_manifest,
+    read_extract,
+    vacuum_store,
+    store_lock,
+    partition_key
+)
+
+def sample_timeline():
+    """Build a small content timeline frame with float years like EXTRACT() returns."""
+    return pd.DataFrame({
+        'year_added': [2019.0, 2019.0, 2020.0, 2021.0],
+        'month_added': [1, 2, 1, 1],
+        'titles_added': [10, 20, 30, 40]
+    })
+
+class TestExtractStore:
+    """Test extract store writes and reads."""
+    
+    def test_partitioned_write_and_manifest(self, tmp_path):
+        """Test that a view is split into partitions with counts and checksums."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        publish_manifest(store, "s1", {"v_content_timeline": entry})
+        
+        manifest = load_manifest(store)
+        partitions = manifest['views']['v_content_timeline']['partitions']
+        
+        assert manifest['snapshot_id'] == "s1"
+        assert sorted(partitions) == ['2019', '2020', '2021']
+        assert partitions['2019']['row_count'] == 2
+        assert len(partitions['2019']['sha256']) == 64
+        assert manifest['views']['v_content_timeline']['row_count'] == 4
+        assert (tmp_path / partitions['2020']['path']).exists()
+    
+    def test_read_extract_partition_pruning(self, tmp_path):
+        """Test that only the requested partitions are read."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        publish_manifest(store, "s1", {"v_content_timeline": entry})
+        
+        df = read_extract(store, "v_content_timeline", partitions=[2019], verify=True)
+        
+        assert len(df) == 2
+        assert df['titles_added'].sum() == 30
+        assert len(read_extract(store, "v_content_timeline")) == 4
+    
+    def test_unpartitioned_view(self, tmp_path):
+        """Test that views without a partition column are stored as one partition."""
+        store = str(tmp_path)
+        df = pd.DataFrame({'genre': ['Dramas', 'Comedies'], 'title_count': [5, 3]})
+        entry = write_partitioned_extract(df, store, "s1", "v_genre_distribution")
+        
+        assert list(entry['partitions']) == ['__all__']
+        assert entry['partitions']['__all__']['row_count'] == 2
+    
+    def test_empty_view(self, tmp_path):
+        """Test that an empty result is stored as an empty view with its columns."""
+        store = str(tmp_path)
+        empty = sample_timeline().iloc[0:0]
+        entry = write_partitioned_extract(empty, store, "s1", "v_content_timeline", "year_added")
+        publish_manifest(store, "s1", {"v_content_timeline": entry})
+        
+        df = read_extract(store, "v_content_timeline")
+        
+        assert entry['row_count'] == 0
+        assert df.empty
+        assert list(df.columns) == ['year_added', 'month_added', 'titles_added']
+    
+    def test_missing_partition_column(self, tmp_path):
+        """Test that an unknown partition column raises an error."""
+        with pytest.raises(ValueError):
+            write_partitioned_extract(sample_timeline(), str(tmp_path), "s1", "v_content_timeline", "release_year")
+    
+    def test_incremental_load_rewrites_changed_partitions(self, tmp_path):
+        """Test that only changed partitions are written in a new snapshot."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        first = publish_manifest(store, "s1", {"v_content_timeline": entry})
+        
+        updated = sample_timeline()
+        updated.loc[3, 'titles_added'] = 99
+        entry = write_partitioned_extract(updated, store, "s2", "v_content_timeline", "year_added", first)
+        publish_manifest(store, "s2", {"v_content_timeline": entry})
+        
+        partitions = load_manifest(store)['views']['v_content_timeline']['partitions']
+        
+        assert partitions['2019']['path'].startswith("snapshots/s1/")
+        assert partitions['2020']['path'].startswith("snapshots/s1/")
+        assert partitions['2021']['path'].startswith("snapshots/s2/")
+        assert read_extract(store, "v_content_timeline", partitions=[2021])['titles_added'].iloc[0] == 99
+    
+    def test_unpublished_snapshot_not_visible(self, tmp_path):
+        """Test that partitions written without publishing do not replace the current snapshot."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        publish_manifest(store, "s1", {"v_content_timeline": entry})
+        
+        updated = sample_timeline()
+        updated['titles_added'] = 0
+        write_partitioned_extract(updated, store, "s2", "v_content_timeline", "year_added", load_manifest(store))
+        
+        assert load_manifest(store)['snapshot_id'] == "s1"
+        assert read_extract(store, "v_content_timeline")['titles_added'].sum() == 100
+    
+    def test_current_points_at_published_snapshot(self, tmp_path):
+        """Test that current/ exposes one flat CSV per view of the published snapshot only."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        publish_manifest(store, "s1", {"v_content_timeline": entry})
+        entry = write_partitioned_extract(sample_timeline().iloc[:2], store, "s2", "v_dropped_later")
+        
+        assert len(pd.read_csv(tmp_path / "current" / "v_content_timeline.csv")) == 4
+        assert not (tmp_path / "current" / "v_dropped_later.csv").exists()
+        
+        publish_manifest(store, "s2", {"v_dropped_later": entry})
+        
+        assert (tmp_path / "current" / "v_dropped_later.csv").exists()
+        assert not (tmp_path / "current" / "v_content_timeline.csv").exists()
+    
+    def test_source_row_order_preserved(self, tmp_path):
+        """Test that the flat file keeps the view's ORDER BY rather than partition order."""
+        store = str(tmp_path)
+        df = pd.DataFrame({
+            'rating': ['PG', 'PG', 'R', 'R'],
+            'release_year': [2021, 2019, 2021, 2019],
+            'title_count': [1, 2, 3, 4]
+        })
+        entry = write_partitioned_extract(df, store, "s1", "v_ratings_analysis", "release_year")
+        publish_manifest(store, "s1", {"v_ratings_analysis": entry})
+        
+        assert (tmp_path / "current" / "v_ratings_analysis.csv").read_text() == df.to_csv(index=False)
+        assert read_extract(store, "v_ratings_analysis", verify=True)['title_count'].tolist() == [1, 2, 3, 4]
+        assert list(entry['partitions']) == ['2021', '2019']
+        assert read_extract(store, "v_ratings_analysis", partitions=[2019, 2021])['title_count'].tolist() == [1, 3, 2, 4]
+    
+    def test_publish_rejects_missing_files(self, tmp_path):
+        """Test that a manifest referencing deleted files is never published."""
+        store = str(tmp_path)
+        entry = write_partitioned_extract(sample_timeline(), store, "s1", "v_content_timeline", "year_added")
+        (tmp_path / entry['partitions']['2020']['path']).unlink()
+        
+        with pytest.raises(FileNotFoundError):
+            publish_manifest(store, "s1", {"v_content_timeline": entry})
+        assert load_manifest(store) is None
+    
+    def test_store_lock_is_exclusive(self, tmp_path):
+        """Test that a second run cannot take the store lock while it is held."""
+        with store_lock(str(tmp_path)):
+            with pytest.raises(RuntimeError):
+                with store_lock(str(tmp_path)):
+                    pass
+        
+        with store_lock(str(tmp_path)):
+            pass
+    
+    def test_vacuum_keeps_referenced_snapshots(self, tmp_path):
+        """Test that vacuum removes only unreferenced snapshots outside the retention window."""
+        store = str(tmp_path)
+        manifest = None
+        for snapshot_id, value in [("s1", 1), ("s2", 2), ("s3", 2)]:
+            df = pd.DataFrame({'release_year': [2020, 2021], 'total_titles': [value, 5]})
+            entry = write_partitioned_extract(df, store, snapshot_id, "v_yearly_releases", "release_year", manifest)
+            manifest = publish_manifest(store, snapshot_id, {"v_yearly_releases": entry})
+        
+        removed = vacuum_store(store, retain=1)
+        
+        # s1 holds the unchanged 2021 partition, s2 the current 2020 partition
+        assert removed == []
+        assert len(read_extract(store, "v_yearly_releases", verify=True)) == 2
+        
+        df = pd.DataFrame({'release_year': [2020, 2021], 'total_titles': [7, 7]})
+        entry = write_partitioned_extract(df, store, "s4", "v_yearly_releases", "release_year", manifest)
+        publish_manifest(store, "s4", {"v_yearly_releases": entry})
+        
+        assert vacuum_store(store, retain=1) == ["s1", "s2", "s3"]
+        assert read_extract(store, "v_yearly_releases")['total_titles'].sum() == 14
+    
+    def test_vacuum_ignores_failed_runs_in_retention(self, tmp_path):
+        """Test that unpublished snapshots do not push published ones out of retention."""
+        store = str(tmp_path)
+        manifest = None
+        for snapshot_id, value in [("s1", 1), ("s2", 2)]:
+            df = pd.DataFrame({'release_year': [2020], 'total_titles': [value]})
+            entry = write_partitioned_extract(df, store, snapshot_id, "v_yearly_releases", "release_year", manifest)
+            manifest = publish_manifest(store, snapshot_id, {"v_yearly_releases": entry})
+        
+        # Failed runs write partitions but never publish
+        for snapshot_id, value in [("s3", 3), ("s4", 4)]:
+            df = pd.DataFrame({'release_year': [2020], 'total_titles': [value]})
+            write_partitioned_extract(df, store, snapshot_id, "v_yearly_releases", "release_year", manifest)
+        
+        df = pd.DataFrame({'release_year': [2020], 'total_titles': [5]})
+        entry = write_partitioned_extract(df, store, "s5", "v_yearly_releases", "release_year", manifest)
+        publish_manifest(store, "s5", {"v_yearly_releases": entry})
+        
+        assert vacuum_store(store, retain=2) == ["s1", "s3", "s4"]
+        assert (tmp_path / "snapshots" / "s2").exists()
+        assert (tmp_path / "_PUBLISHED").read_text().split() == ["s2", "s5"]
+    
+    def test_partition_key(self):
+        """Test partition key normalisation."""
+        assert partition_key(2019.0) == '2019'
+        assert partition_key(None) == '%null'
+        assert partition_key(float('nan')) == '%null'
+        assert partition_key('TV Show') == 'TV Show'
+        assert partition_key('a/b') != partition_key('a_b')
+        assert partition_key(' Drama') != partition_key('Drama')
+        assert partition_key('%null') != partition_key(None)
+        assert partition_key('__null__') != partition_key(None)
+    
+    def test_distinct_values_do_not_collide(self, tmp_path):
+        """Test that values differing only in unsafe characters get separate partitions."""
+        store = str(tmp_path)
+        df = pd.DataFrame({
+            'rating': ['a/b', 'a_b', 'a_b', ' Drama', 'Drama', None],
+            'title_count': [1, 2, 3, 4, 5, 6]
+        })
+        entry = write_partitioned_extract(df, store, "s1", "v_ratings", "rating")
+        publish_manifest(store, "s1", {"v_ratings": entry})
+        
+        assert len(entry['partitions']) == 5
+        assert read_extract(store, "v_ratings", partitions=['a/b'])['title_count'].tolist() == [1]
+        assert read_extract(store, "v_ratings", partitions=[' Drama'])['title_count'].tolist() == [4]
+        assert read_extract(store, "v_ratings", partitions=[None])['title_count'].tolist() == [6]
+
+if __name__ == "__main__":
+    pytest.main([__file__])